@@ -1,4 +1,4 @@
-from cfg import cfg
+from service.cfg import cfg
 from supabase import AsyncClient, acreate_client
 
 _URL = cfg.sbs_url
@@ -15,6 +15,6 @@ async def init_supabase():
 
 
 async def cnx_sbs() -> AsyncClient:
-    if not _SBS_CNX:
+    if _SBS_CNX is None:
         raise Exception("Supabase not initialised")
     return _SBS_CNX
@@ -1,24 +1,18 @@
-import asyncio as aio
 from datetime import datetime as dtm
 
 import strawberry
-from service.schemas.common import About, PyAbout
+from service.schemas.common import About
+
+_ABOUT_BASE = {
+    "env": "dev",
+    "version": "1.0.1",
+    "hosted_at": "localhost",
+    "node": "localhost",
+}
 
 
 async def q_about() -> About:
-    res = await get_about()
-    return About.from_pydantic(res)
-
-
-async def get_about():
-    await aio.sleep(0.01)
-    return PyAbout(
-        env="dev",
-        version="1.0.1",
-        hosted_at="localhost",
-        node="localhost",
-        server_time=dtm.now().isoformat(),
-    )
+    return About(**_ABOUT_BASE, server_time=dtm.now().isoformat())
 
 
 @strawberry.type
@@ -1,11 +1,22 @@
-from pydantic import BaseModel
+from typing import List
 
+from pydantic_settings import BaseSettings, SettingsConfigDict
+
+
+class Config(BaseSettings):
+    model_config = SettingsConfigDict(frozen=True, env_prefix="STICHO_")
 
-class Config(BaseModel):
     # Microservice
     port: int = 36016
+    workers: int = 1
     env: str = "test"
     enforce_iam: bool = True
+    log_level: str = "WARNING"
+    cors_origins: List[str] = []
+
+    # Session cache
+    session_cache_size: int = 10000
+    session_cache_ttl: int = 30
 
     # Stytch
     secret: str = "secret-test-"
@@ -7,13 +7,26 @@ This module contains all authentication-related functionality:
 3. require_auth - Dependency for requiring authentication in FastAPI routes
 """
 
-from typing import Any, Callable, Dict, Optional, List, Annotated
-
+import asyncio
+import hashlib
+import logging
+import re
+import time
+from urllib.parse import quote
+from typing import Callable, Dict, Optional, List, Annotated
+
+import jwt
+import orjson
+from cachetools import TTLCache
 from fastapi import FastAPI, Request, Response, HTTPException, Depends, Header, Cookie
 from service.cfg import cfg
+from service.schemas.common import SessionInfo
 from stytch import Client
 from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.responses import JSONResponse, RedirectResponse
+from fastapi.responses import ORJSONResponse
+from starlette.responses import RedirectResponse
+
+logger = logging.getLogger(__name__)
 
 # Create Stytch client using configuration from cfg.py
 stytch_client = Client(
@@ -22,101 +35,129 @@ stytch_client = Client(
     environment=cfg.env
 )
 
-# List of paths that don't require authentication
-PUBLIC_PATHS = [
+# Config is frozen, so bind per-request flags once
+_ENFORCE_IAM = cfg.enforce_iam
+
+# Upper bound on how long startup waits for the JWKS prefetch
+_JWKS_PREFETCH_TIMEOUT = 5
+
+# Verified sessions keyed by SHA-256 of the token, stored with their expiry
+_session_cache: TTLCache = TTLCache(
+    maxsize=cfg.session_cache_size,
+    ttl=cfg.session_cache_ttl
+)
+
+# Validations currently running, so concurrent requests with the same token share one
+_inflight: Dict[str, asyncio.Future] = {}
+
+# Paths that don't require authentication: exact matches and prefix families
+PUBLIC_PATHS = frozenset({
     "/",
-    "/auth/",
     "/auth/sso/google",
     "/auth/callback",
     "/docs",
+    "/docs/oauth2-redirect",
     "/redoc",
-]
+    "/openapi.json",
+})
+PUBLIC_PATH_PREFIX = re.compile(r"^/auth/")
+
+# Static 401 bodies, serialised once
+_ERR_AUTH_REQUIRED = orjson.dumps({"error": "Authentication required"})
+_ERR_GQL_AUTH_REQUIRED = orjson.dumps({"error": "Authentication required for GraphQL endpoint"})
+
+# Google OAuth start URL, built once from the (immutable) config
+_GOOGLE_OAUTH_URL = (
+    f"https://{cfg.env}.stytch.com/v1/public/oauth/google/start"
+    f"?public_token={quote(cfg.public_token, safe='')}"
+    f"&login_redirect_url={quote(cfg.redirect_url, safe='')}"
+)
 
 
-class StytchAuthMiddleware(BaseHTTPMiddleware):
-    def __init__(self, app):
-        super().__init__(app)
-        self.public_paths = PUBLIC_PATHS
+def is_public_path(path: str) -> bool:
+    return path in PUBLIC_PATHS or PUBLIC_PATH_PREFIX.match(path) is not None
+
+
+def _extract_token(cookie: Optional[str], auth_header: Optional[str]) -> Optional[str]:
+    """Return the session token from the cookie or an (optionally Bearer) Authorization header."""
+    token = cookie.strip() if cookie else None
+    if not token and auth_header:
+        token = (auth_header[7:] if auth_header.startswith("Bearer ") else auth_header).strip()
+    return token or None
+
 
+class StytchAuthMiddleware(BaseHTTPMiddleware):
     async def dispatch(self, request: Request, call_next: Callable) -> Response:
-        if not cfg.enforce_iam:
-            print("AUTH MIDDLEWARE: IAM enforcement is disabled, bypassing authentication")
+        if not _ENFORCE_IAM:
+            logger.debug("AUTH MIDDLEWARE: IAM enforcement is disabled, bypassing authentication")
             request.state.authenticated = True
             return await call_next(request)
-        if any(request.url.path.startswith(path) for path in self.public_paths):
+        # Preflights and public paths never carry credentials worth checking
+        if request.method == "OPTIONS" or is_public_path(request.url.path):
             return await call_next(request)
 
-        if request.url.path.startswith("/gql"):
-            print(f"AUTH MIDDLEWARE: GraphQL request detected: {request.url.path}")
-
-            session_token = request.cookies.get("session")
-            if not session_token and "Authorization" in request.headers:
-                auth_header = request.headers["Authorization"]
-                if auth_header.startswith("Bearer "):
-                    session_token = auth_header[7:]
-            session_token = session_token.strip()
-            print(f"AUTH MIDDLEWARE: Session token: {session_token}")
-
-            if not session_token:
-                print("AUTH MIDDLEWARE: No session token found, returning 401")
-                return JSONResponse(
-                    status_code=401,
-                    content={"error": "Authentication required for GraphQL endpoint"}
-                )
-
-            # Validate the session token
-            try:
-                print(f"AUTH MIDDLEWARE: Validating session token: {session_token[:10]}...")
-                session = await validate_session(session_token)
-                print(f"AUTH MIDDLEWARE: Session validated successfully for user: {session.get('user_id')}")
-
-                # Store session info in request state for the endpoint to use
-                request.state.session = session
-                request.state.authenticated = True
-                request.state.user_id = session.get("user_id")
-
-                # Continue to the endpoint
-                print("AUTH MIDDLEWARE: Continuing to GraphQL endpoint")
-                return await call_next(request)
-            except Exception as e:
-                print(f"AUTH MIDDLEWARE: Session validation failed: {str(e)}")
-                return JSONResponse(
-                    status_code=401,
-                    content={"error": f"Invalid session: {str(e)}"}
-                )
-
-        # For non-GraphQL endpoints that aren't in the public paths list
-        # Check for session token in cookies or Authorization header
-        session_token = request.cookies.get("session")
-        if not session_token and "Authorization" in request.headers:
-            auth_header = request.headers["Authorization"]
-            if auth_header.startswith("Bearer "):
-                session_token = auth_header[7:]  # Remove 'Bearer ' prefix
-
+        session_token = self._get_token(request)
         if not session_token:
-            return JSONResponse(
-                status_code=401,
-                content={"error": "Authentication required"}
+            logger.debug("AUTH MIDDLEWARE: No session token found, returning 401")
+            content = (
+                _ERR_GQL_AUTH_REQUIRED
+                if request.url.path.startswith("/gql")
+                else _ERR_AUTH_REQUIRED
             )
+            return Response(content=content, status_code=401, media_type="application/json")
 
-        # Validate the session token
         try:
-            session = await validate_session(session_token)
-            # Store session info in request state for the endpoint to use
-            request.state.session = session
-            request.state.authenticated = True
-            request.state.user_id = session.get("user_id")
-
-            # Continue to the endpoint
-            return await call_next(request)
+            await self._authenticate(request, session_token)
         except Exception as e:
-            return JSONResponse(
+            logger.debug("AUTH MIDDLEWARE: Session validation failed: %s", e)
+            return ORJSONResponse(
                 status_code=401,
                 content={"error": f"Invalid session: {str(e)}"}
             )
 
+        # Continue to the endpoint
+        return await call_next(request)
+
+    @staticmethod
+    def _get_token(request: Request) -> Optional[str]:
+        return _extract_token(
+            request.cookies.get("session"),
+            request.headers.get("Authorization")
+        )
+
+    @staticmethod
+    async def _authenticate(request: Request, session_token: str) -> None:
+        session = await validate_session(session_token)
+
+        # Store session info in request state for the endpoint to use
+        request.state.session = session
+        request.state.authenticated = True
+        request.state.user_id = session.user_id
+
+
+async def init_stytch():
+    """
+    Prefetch the Stytch JWKS so the first requests don't pay for the fetch.
+
+    The JWKS client still refetches when its cache expires or a token has an
+    unknown kid; validate_session runs that work off the event loop. Startup
+    waits at most _JWKS_PREFETCH_TIMEOUT seconds; on timeout or failure a
+    warning is logged and the JWKS is fetched lazily on first use.
+    """
+    try:
+        await asyncio.wait_for(
+            asyncio.to_thread(stytch_client.sessions.jwks_client.get_jwk_set),
+            timeout=_JWKS_PREFETCH_TIMEOUT
+        )
+    except asyncio.TimeoutError:
+        logger.warning(
+            "INIT STYTCH: JWKS prefetch timed out after %ss", _JWKS_PREFETCH_TIMEOUT
+        )
+    except Exception as e:
+        logger.warning("INIT STYTCH: Unable to prefetch JWKS: %s", e)
+
 
-async def validate_session(session_token: str) -> Dict[str, Any]:
+async def validate_session(session_token: str) -> SessionInfo:
     """
     Validate a session token.
 
@@ -124,46 +165,89 @@ async def validate_session(session_token: str) -> Dict[str, Any]:
         session_token: JWT session token
 
     Returns:
-        Dict: Session information including user_id
+        SessionInfo: Session information including user_id
 
     Raises:
         Exception: If session is invalid
     """
     if not session_token:
-        print("VALIDATE SESSION: No session token provided")
         raise Exception("No session token provided")
 
-    try:
-        print(f"VALIDATE SESSION: Attempting to validate token: {session_token}")
+    key = hashlib.sha256(session_token.encode()).hexdigest()
+    cached = _session_cache.get(key)
+    if cached is not None:
+        session_info, expires_at = cached
+        if expires_at is None or expires_at > time.time():
+            return session_info
+        _session_cache.pop(key, None)
 
-        # Use local JWT validation first for performance
-        session = stytch_client.sessions.authenticate_jwt_local(
+    while (fut := _inflight.get(key)) is not None:
+        try:
+            # Shielded so a cancelled waiter does not cancel the shared validation
+            return await asyncio.shield(fut)
+        except asyncio.CancelledError:
+            # Propagate our own cancellation; if the leader was cancelled, take over
+            if not fut.cancelled() or asyncio.current_task().cancelling():
+                raise
+
+    fut = asyncio.get_running_loop().create_future()
+    _inflight[key] = fut
+    try:
+        session_info = await _verify_session(session_token, key)
+        fut.set_result(session_info)
+        return session_info
+    except Exception as e:
+        fut.set_exception(e)
+        # Mark the exception as retrieved in case nobody else was waiting
+        fut.exception()
+        raise
+    finally:
+        _inflight.pop(key, None)
+        if not fut.done():
+            fut.cancel()
+
+
+async def _verify_session(session_token: str, key: str) -> SessionInfo:
+    """Verify a token with Stytch and cache the resulting session under key."""
+    try:
+        # Use local JWT validation first for performance. It runs off the event
+        # loop because the JWKS client refetches keys over HTTP when its cache
+        # expires or the token carries an unknown kid.
+        session = await asyncio.to_thread(
+            stytch_client.sessions.authenticate_jwt_local,
             session_jwt=session_token
         )
 
         if not session:
-            print("VALIDATE SESSION: Local validation failed, trying API validation")
+            logger.debug("VALIDATE SESSION: Local validation failed, trying API validation")
             # Fall back to API validation if local validation fails
-            result = stytch_client.sessions.authenticate(
+            result = await stytch_client.sessions.authenticate_async(
                 session_jwt=session_token
             )
-            print(f"VALIDATE SESSION: API validation successful for user: {result.user_id}")
-            return {
-                "user_id": result.user_id,
-                "session_id": result.session_id,
-                "authenticated": True
-            }
-
-        print(f"VALIDATE SESSION: Local validation successful for user: {session.user_id}")
-        return {
-            "user_id": session.user_id,
-            "session_id": session.session_id,
-            "authenticated": True
-        }
+            session = result.session
+
+        # The signature is already verified; read exp to bound the cache entry
+        claims = jwt.decode(session_token, options={"verify_signature": False})
     except Exception as e:
-        print(f"VALIDATE SESSION: Validation failed with error: {str(e)}")
+        logger.debug("VALIDATE SESSION: Validation failed with error: %s", e)
         raise Exception(f"Invalid session: {str(e)}")
 
+    session_info = SessionInfo(
+        user_id=session.user_id,
+        session_id=session.session_id,
+        authenticated=True
+    )
+    # Never cache beyond the JWT's own exp or the session's expiry
+    expires_at = claims.get("exp")
+    if session.expires_at:
+        session_expires_at = session.expires_at.timestamp()
+        expires_at = (
+            session_expires_at if expires_at is None
+            else min(expires_at, session_expires_at)
+        )
+    _session_cache[key] = (session_info, expires_at)
+    return session_info
+
 
 async def start_google_oauth() -> RedirectResponse:
     """
@@ -172,14 +256,7 @@ async def start_google_oauth() -> RedirectResponse:
     Returns:
         RedirectResponse: Redirect to Google OAuth page
     """
-    # Get the Google OAuth URL
-    oauth_url = f"https://{cfg.env}.stytch.com/v1/public/oauth/google/start"
-
-    # Build the full URL with parameters
-    full_url = f"{oauth_url}?public_token={cfg.public_token}&login_redirect_url={cfg.redirect_url}"
-
-    # Redirect to the OAuth URL
-    return RedirectResponse(url=full_url)
+    return RedirectResponse(url=_GOOGLE_OAUTH_URL)
 
 
 async def handle_oauth_callback(token: Optional[str] = None) -> Response:
@@ -193,14 +270,14 @@ async def handle_oauth_callback(token: Optional[str] = None) -> Response:
         Response: Redirect with session cookie or error response
     """
     if not token:
-        return JSONResponse(
+        return ORJSONResponse(
             status_code=400,
             content={"error": "No authentication token provided"}
         )
 
     try:
         # Authenticate with the token
-        result = stytch_client.oauth.authenticate(token=token)
+        result = await stytch_client.oauth.authenticate_async(token=token)
 
         # Create a response that redirects to the GraphQL endpoint
         response = RedirectResponse(url="/gql")
@@ -215,7 +292,7 @@ async def handle_oauth_callback(token: Optional[str] = None) -> Response:
 
         return response
     except Exception as e:
-        return JSONResponse(
+        return ORJSONResponse(
             status_code=401,
             content={"error": f"Authentication failed: {str(e)}"}
         )
@@ -225,7 +302,7 @@ async def require_auth(
     request: Request,
     session: Optional[str] = Cookie(None),
     authorization: Optional[str] = Header(None)
-) -> Dict[str, Any]:
+) -> SessionInfo:
     """
     Dependency for requiring authentication in FastAPI routes.
 
@@ -235,22 +312,24 @@ async def require_auth(
         authorization: Authorization header
 
     Returns:
-        Dict: Session information
+        SessionInfo: Session information
 
     Raises:
         HTTPException: If authentication fails
     """
-    print("REQUIRE_AUTH: Checking authentication")
+    # Reuse the session already validated by StytchAuthMiddleware
+    if getattr(request.state, "authenticated", False) and getattr(request.state, "session", None):
+        return request.state.session
 
     # Check if IAM enforcement is disabled
-    if not cfg.enforce_iam:
-        print("REQUIRE_AUTH: IAM enforcement is disabled, bypassing authentication")
+    if not _ENFORCE_IAM:
+        logger.debug("REQUIRE_AUTH: IAM enforcement is disabled, bypassing authentication")
         # Return a dummy session
-        dummy_session = {
-            "user_id": "anonymous",
-            "session_id": "none",
-            "authenticated": True
-        }
+        dummy_session = SessionInfo(
+            user_id="anonymous",
+            session_id="none",
+            authenticated=True
+        )
         # Store session info in request state
         request.state.session = dummy_session
         request.state.authenticated = True
@@ -258,16 +337,10 @@ async def require_auth(
         return dummy_session
 
     # Get session token from cookie or header
-    session_token = session
-    if not session_token and authorization:
-        if authorization.startswith("Bearer "):
-            session_token = authorization[7:]  # Remove 'Bearer ' prefix
-        else:
-            session_token = authorization
-        session_token = session_token.strip()
+    session_token = _extract_token(session, authorization)
 
     if not session_token:
-        print("REQUIRE_AUTH: No session token found")
+        logger.debug("REQUIRE_AUTH: No session token found")
         raise HTTPException(
             status_code=401,
             detail="Authentication required"
@@ -275,19 +348,16 @@ async def require_auth(
 
     try:
         # Validate the session token
-        print(f"REQUIRE_AUTH: Validating session token: {session_token}")
         session_info = await validate_session(session_token)
-        print(f"REQUIRE_AUTH: Session info: {session_info}")
-        print(f"REQUIRE_AUTH: Session validated for user: {session_info.get('user_id')}")
 
         # Store session info in request state
         request.state.session = session_info
         request.state.authenticated = True
-        request.state.user_id = session_info.get("user_id")
+        request.state.user_id = session_info.user_id
 
         return session_info
     except Exception as e:
-        print(f"REQUIRE_AUTH: Authentication failed: {str(e)}")
+        logger.debug("REQUIRE_AUTH: Authentication failed: %s", e)
         raise HTTPException(
             status_code=401,
             detail=f"Invalid session: {str(e)}"
@@ -309,5 +379,4 @@ def setup_auth_routes(app: FastAPI) -> None:
     @app.get("/auth/callback")
     async def callback_route(token: str = None):
         """Handle OAuth callback."""
-        print("Token:", token)
         return await handle_oauth_callback(token)
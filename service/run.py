@@ -1,32 +1,63 @@
+import logging
+
 import strawberry
 import uvicorn
 from fastapi import FastAPI, Request, Depends
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+from strawberry.extensions import ParserCache, ValidationCache
 from strawberry.fastapi import GraphQLRouter
 from contextlib import asynccontextmanager
+from urllib.parse import urlsplit
 from service import qry
 from service import init_supabase
 from service.cfg import cfg
-from service.middleware.auth import StytchAuthMiddleware, setup_auth_routes, require_auth
+from service.middleware.auth import StytchAuthMiddleware, setup_auth_routes, require_auth, init_stytch
+
+logger = logging.getLogger(__name__)
+
+
+def setup_logging():
+    service_logger = logging.getLogger("service")
+    if not service_logger.handlers:
+        service_logger.addHandler(logging.StreamHandler())
+    service_logger.setLevel(cfg.log_level)
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    setup_logging()
+    if cfg.env != "test" and not cfg.cors_origins:
+        logger.warning(
+            "CORS: cors_origins is not set; only %s is allowed", cors_origins[0]
+        )
     try:
         # await init_supabase()
+        await init_stytch()
         yield
     finally:
-        print("Shutting down...")
+        logger.info("Shutting down...")
 
 
 app = FastAPI(lifespan=lifespan)
 gql_middlewares = []
 
-# Add CORS middleware AFTER auth middleware
+# Configured origins always win. Without them, the Stytch "test" environment
+# allows any origin and others fall back to this API's own origin (from the
+# OAuth redirect URL), which blocks any separately hosted frontend
+_redirect = urlsplit(cfg.redirect_url)
+cors_origins = cfg.cors_origins or (
+    ["*"] if cfg.env == "test"
+    else [f"{_redirect.scheme}://{_redirect.netloc}"]
+)
+
+# Middleware added last runs first: CORS answers preflights before auth runs,
+# and GZip sits between them so auth responses are compressed too
 app.add_middleware(StytchAuthMiddleware)
+app.add_middleware(GZipMiddleware, minimum_size=512, compresslevel=4)
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=["*"],
+    allow_origins=cors_origins,
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
@@ -35,21 +66,25 @@ app.add_middleware(
 # Set up authentication routes
 setup_auth_routes(app)
 
-# Create GraphQL schema
-schema = strawberry.Schema(query=qry.Query)
+# Create GraphQL schema; parsed and validated documents are cached across requests
+schema = strawberry.Schema(
+    query=qry.Query,
+    extensions=[
+        ParserCache(maxsize=100),
+        ValidationCache(maxsize=100),
+    ]
+)
 
-# Define context getter function to pass request to resolvers
+# Define context getter function to pass request to resolvers. Kept async:
+# FastAPI runs sync dependencies in its threadpool.
 async def get_context(request: Request):
-    print(f"GRAPHQL CONTEXT: Creating context for request to {request.url.path}")
-
-    # Check if the request has been authenticated by the middleware
-    if hasattr(request.state, "authenticated"):
-        print(f"GRAPHQL CONTEXT: Request authenticated: {request.state.authenticated}")
-        if hasattr(request.state, "user_id"):
-            print(f"GRAPHQL CONTEXT: User ID: {request.state.user_id}")
-    else:
-        print("GRAPHQL CONTEXT: Request not authenticated by middleware!")
-
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(
+            "GRAPHQL CONTEXT: %s authenticated=%s user_id=%s",
+            request.url.path,
+            getattr(request.state, "authenticated", False),
+            getattr(request.state, "user_id", None),
+        )
     return {"request": request}
 
 # Add GraphQL router with context and authentication dependency
@@ -71,4 +106,5 @@ if __name__ == "__main__":
         port=cfg.port,
         host="0.0.0.0",
         access_log=False,
+        workers=cfg.workers,
     )
@@ -1,8 +1,8 @@
 import strawberry
-from pydantic import BaseModel
 
 
-class PyAbout(BaseModel):
+@strawberry.type
+class About:
     env: str
     version: str
     hosted_at: str
@@ -10,6 +10,13 @@ class PyAbout(BaseModel):
     server_time: str
 
 
-@strawberry.experimental.pydantic.type(model=PyAbout, all_fields=True)
-class About:
-    pass
+class SessionInfo:
+    __slots__ = ("user_id", "session_id", "authenticated")
+
+    def __init__(self, user_id: str, session_id: str, authenticated: bool = True):
+        self.user_id = user_id
+        self.session_id = session_id
+        self.authenticated = authenticated
+
+    def __repr__(self) -> str:
+        return f"SessionInfo(user_id={self.user_id!r}, session_id={self.session_id!r})"
@@ -0,0 +1,202 @@
+"""
+Tests for the authentication middleware helpers.
+"""
+
+import asyncio
+import sys
+import os
+import uuid
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import jwt
+import pytest
+
+# Add the project root to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from service.schemas.common import SessionInfo
+from service.middleware import auth
+from service.middleware.auth import _extract_token, is_public_path, validate_session
+
+
+def test_extract_token_prefers_cookie():
+    """The session cookie wins over the Authorization header."""
+    assert _extract_token("cookie-token", "Bearer header-token") == "cookie-token"
+
+
+def test_extract_token_from_bearer_header():
+    """A Bearer header is stripped of its prefix and whitespace."""
+    assert _extract_token(None, "Bearer  header-token ") == "header-token"
+
+
+def test_extract_token_from_raw_header():
+    """A header without the Bearer prefix is used as-is."""
+    assert _extract_token(None, "raw-token") == "raw-token"
+
+
+def test_extract_token_missing():
+    """No cookie and no header yields no token."""
+    assert _extract_token(None, None) is None
+    assert _extract_token("", "  ") is None
+    assert _extract_token(None, "Bearer   ") is None
+
+
+def test_extract_token_blank_cookie_falls_back_to_header():
+    """A whitespace-only cookie does not shadow the Authorization header."""
+    assert _extract_token("  ", "Bearer header-token") == "header-token"
+
+
+def test_public_paths():
+    """Exact public paths and the /auth/ family skip authentication."""
+    assert is_public_path("/")
+    assert is_public_path("/docs")
+    assert is_public_path("/docs/oauth2-redirect")
+    assert is_public_path("/redoc")
+    assert is_public_path("/openapi.json")
+    assert is_public_path("/auth/callback")
+    assert is_public_path("/auth/anything")
+    assert not is_public_path("/gql")
+    assert not is_public_path("/docs-private")
+
+
+def test_concurrent_validations_are_coalesced():
+    """Concurrent requests with the same token share a single verification."""
+    calls = []
+
+    async def fake_verify(session_token, key):
+        calls.append(session_token)
+        await asyncio.sleep(0.01)
+        return SessionInfo(user_id="test-user-id", session_id="test-session-id")
+
+    async def run():
+        return await asyncio.gather(*(validate_session("coalesce-token") for _ in range(5)))
+
+    with patch("service.middleware.auth._verify_session", fake_verify):
+        results = asyncio.run(run())
+
+    assert len(calls) == 1
+    assert all(r.user_id == "test-user-id" for r in results)
+
+
+def test_concurrent_validation_errors_are_shared():
+    """A failed verification is raised to every waiter and is not left in flight."""
+    calls = []
+
+    async def fake_verify(session_token, key):
+        calls.append(session_token)
+        await asyncio.sleep(0.01)
+        raise Exception("Invalid session: bad token")
+
+    async def run():
+        return await asyncio.gather(
+            *(validate_session("error-token") for _ in range(3)),
+            return_exceptions=True
+        )
+
+    with patch("service.middleware.auth._verify_session", fake_verify):
+        results = asyncio.run(run())
+
+    assert len(calls) == 1
+    assert all(isinstance(r, Exception) and "bad token" in str(r) for r in results)
+    assert not auth._inflight
+
+
+def test_cancelled_leader_does_not_fail_waiters():
+    """Waiters take over the validation when the request that started it is cancelled."""
+    calls = []
+
+    async def fake_verify(session_token, key):
+        calls.append(session_token)
+        await asyncio.sleep(0.01)
+        return SessionInfo(user_id="test-user-id", session_id="test-session-id")
+
+    async def run():
+        leader = asyncio.create_task(validate_session("cancel-token"))
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(validate_session("cancel-token"))
+        await asyncio.sleep(0)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return await waiter
+
+    with patch("service.middleware.auth._verify_session", fake_verify):
+        result = asyncio.run(run())
+
+    assert len(calls) == 2
+    assert result.user_id == "test-user-id"
+    assert not auth._inflight
+
+
+def _session_jwt(expires_in: timedelta) -> str:
+    """Build a unique JWT whose exp claim is expires_in from now."""
+    exp = datetime.now(timezone.utc) + expires_in
+    return jwt.encode(
+        {"jti": uuid.uuid4().hex, "exp": int(exp.timestamp())},
+        "test-secret",
+        algorithm="HS256"
+    )
+
+
+def _stytch_session(expires_in: timedelta):
+    """Build a minimal Stytch session expiring after expires_in."""
+    return SimpleNamespace(
+        user_id="test-user-id",
+        session_id="test-session-id",
+        expires_at=datetime.now(timezone.utc) + expires_in
+    )
+
+
+def test_cached_session_skips_verification():
+    """A second validation of the same token is served from the cache."""
+    with patch.object(
+        auth.stytch_client.sessions, "authenticate_jwt_local",
+        return_value=_stytch_session(timedelta(hours=1))
+    ) as mock:
+        token = _session_jwt(timedelta(minutes=5))
+        first = asyncio.run(validate_session(token))
+        second = asyncio.run(validate_session(token))
+
+    assert mock.call_count == 1
+    assert second is first
+
+
+def test_expired_session_is_evicted():
+    """A cached session past its JWT expiry is verified again."""
+    with patch.object(
+        auth.stytch_client.sessions, "authenticate_jwt_local",
+        return_value=_stytch_session(timedelta(seconds=-1))
+    ) as mock:
+        token = _session_jwt(timedelta(minutes=5))
+        asyncio.run(validate_session(token))
+        asyncio.run(validate_session(token))
+
+    assert mock.call_count == 2
+
+
+def test_expired_jwt_is_evicted_before_session_expiry():
+    """A cached session is verified again once the JWT's exp passes, even if the session lives on."""
+    with patch.object(
+        auth.stytch_client.sessions, "authenticate_jwt_local",
+        return_value=_stytch_session(timedelta(days=7))
+    ) as mock:
+        token = _session_jwt(timedelta(seconds=-1))
+        asyncio.run(validate_session(token))
+        asyncio.run(validate_session(token))
+
+    assert mock.call_count == 2
+
+
+def test_failed_validation_is_not_cached():
+    """An invalid token is verified (and rejected) on every attempt."""
+    with patch.object(
+        auth.stytch_client.sessions, "authenticate_jwt_local",
+        side_effect=Exception("bad signature")
+    ) as mock:
+        for _ in range(2):
+            with pytest.raises(Exception, match="Invalid session"):
+                asyncio.run(validate_session("cache-invalid-token"))
+
+    assert mock.call_count == 2
@@ -0,0 +1,55 @@
+"""
+Tests for the CORS configuration of the service.
+"""
+
+import importlib
+import sys
+import os
+
+import pytest
+from fastapi.testclient import TestClient
+
+# Add the project root to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import service.cfg
+import service.run
+
+ALLOWED_ORIGIN = "https://app.example.com"
+
+
+@pytest.fixture
+def configured_run(monkeypatch):
+    """Reload the app with STICHO_CORS_ORIGINS set, restoring the defaults afterwards."""
+    monkeypatch.setenv("STICHO_CORS_ORIGINS", f'["{ALLOWED_ORIGIN}"]')
+    importlib.reload(service.cfg)
+    yield importlib.reload(service.run)
+    monkeypatch.delenv("STICHO_CORS_ORIGINS")
+    importlib.reload(service.cfg)
+    importlib.reload(service.run)
+
+
+def _preflight(client, origin):
+    return client.options(
+        "/gql",
+        headers={"Origin": origin, "Access-Control-Request-Method": "POST"}
+    )
+
+
+def test_configured_origins_override_test_wildcard(configured_run):
+    """Origins from config are used even in the Stytch test environment."""
+    assert configured_run.cfg.env == "test"
+    assert configured_run.cors_origins == [ALLOWED_ORIGIN]
+
+
+def test_preflight_only_allows_configured_origins(configured_run):
+    """A preflight from an unlisted origin is not granted CORS access."""
+    client = TestClient(configured_run.app)
+
+    allowed = _preflight(client, ALLOWED_ORIGIN)
+    assert allowed.status_code == 200
+    assert allowed.headers["access-control-allow-origin"] == ALLOWED_ORIGIN
+
+    denied = _preflight(client, "https://evil.example")
+    assert denied.status_code == 400
+    assert "access-control-allow-origin" not in denied.headers